@@ -5,22 +5,55 @@ Downloads PDFs, reviews, supplementary materials, and code for papers.
 Requires metadata.csv (generated by scrape_metadata.py).
 """
 
+from __future__ import annotations
+
+import functools
 import os
 import re
 import json
 import time
 import random
 import logging
+import shutil
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.client import IncompleteRead
 from pathlib import Path
 from urllib.parse import urljoin, urlparse, parse_qs
 from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 from tqdm import tqdm
-import openreview
+
+try:
+    import orjson  # ~10x faster dumps than stdlib json
+except ImportError:
+    orjson = None
+
+try:
+    import lxml  # noqa: F401 - libxml2-backed parser, ~10x faster than html.parser
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Constants
+OPENREVIEW_BASE = "https://openreview.net"
+OPENREVIEW_API_BASE = "https://api2.openreview.net"
+DOWNLOAD_DIR = Path("downloads")
+PDF_DIR = DOWNLOAD_DIR / "pdfs"
+REVIEWS_DIR = DOWNLOAD_DIR / "reviews"
+SUPPLEMENTARY_DIR = DOWNLOAD_DIR / "supplementary"
+CODE_DIR = DOWNLOAD_DIR / "code"
+
+# The log file lives under downloads/, so that directory must exist before
+# the FileHandler below opens it
+DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 # Configure logging
 logging.basicConfig(
@@ -33,18 +66,104 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Constants
-OPENREVIEW_BASE = "https://openreview.net"
-OPENREVIEW_API_BASE = "https://api2.openreview.net"
-DOWNLOAD_DIR = Path("downloads")
-PDF_DIR = DOWNLOAD_DIR / "pdfs"
-REVIEWS_DIR = DOWNLOAD_DIR / "reviews"
-SUPPLEMENTARY_DIR = DOWNLOAD_DIR / "supplementary"
-CODE_DIR = DOWNLOAD_DIR / "code"
+# Global request rate shared by all workers (requests/second, burst size)
+RATE_LIMIT = 5.0
+RATE_BURST = 10
 
-# Request delays (in seconds)
-MIN_DELAY = 0.3
-MAX_DELAY = 1.0
+# Number of papers processed concurrently (downloads are network-bound).
+# Override via the DOWNLOAD_WORKERS environment variable for high-fan-out runs.
+MAX_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+
+# Shared HTTP session so TCP/TLS connections are pooled and reused across
+# requests (and across worker threads) instead of re-handshaking per call.
+# pool_block=True makes pool_maxsize a hard cap on concurrent connections per
+# host (the requests equivalent of aiohttp's limit_per_host) instead of
+# letting overflow connections bypass the pool and be torn down after use.
+# Adapter-level retries absorb transient 429/5xx responses and dropped
+# connections without tearing down the pooled connection state; the manual
+# retry loops in the download functions still handle truncated transfers.
+_RETRY_POLICY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(['GET', 'HEAD'])
+)
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=64, pool_block=True,
+                                      max_retries=_RETRY_POLICY))
+SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=64, pool_block=True,
+                                     max_retries=_RETRY_POLICY))
+
+# Pre-compiled patterns (compiled once at import instead of per call)
+_FILENAME_RE = re.compile(r'filename[^;=\n]*=(([\'"]).*?\2|[^\s;]+)')
+_GITHUB_REPO_RE = re.compile(r'github\.com[/:]([^/]+)/([^/\s]+)')
+# 'supp' also matches 'supplementary', so one alternation covers both
+_SUPP_HINT_RE = re.compile(r'supp', re.IGNORECASE)
+_PDF_HINT_RE = re.compile(r'pdf|download', re.IGNORECASE)
+
+# Only materialize the tags the forum-page scans actually read; the rest of
+# the page never enters the BeautifulSoup tree
+_A_HREF_STRAINER = SoupStrainer('a', href=True)
+_PDF_LINK_STRAINER = SoupStrainer(['a', 'iframe'])
+
+# Forums whose direct PDF link is known (from a previous run) to serve
+# non-PDF content - persisted so re-runs skip the wasted request
+_NO_DIRECT_PDF_CACHE = DOWNLOAD_DIR / ".no_direct_pdf"
+_no_direct_pdf = set()
+_NO_DIRECT_PDF_LOCK = threading.Lock()
+
+
+def load_no_direct_pdf_cache() -> None:
+    """Load the cached set of forums without a working direct PDF link."""
+    if _NO_DIRECT_PDF_CACHE.exists():
+        _no_direct_pdf.update(_NO_DIRECT_PDF_CACHE.read_text(encoding='utf-8').split())
+        logger.info(f"Loaded {len(_no_direct_pdf)} forums known to lack a direct PDF link")
+
+
+def remember_no_direct_pdf(forum_id: str) -> None:
+    """Record that the direct PDF link for this forum serves non-PDF content."""
+    with _NO_DIRECT_PDF_LOCK:
+        if forum_id not in _no_direct_pdf:
+            _no_direct_pdf.add(forum_id)
+            with open(_NO_DIRECT_PDF_CACHE, 'a', encoding='utf-8') as f:
+                f.write(forum_id + '\n')
+
+
+# forum_id -> suffix for files already in supplementary/, built with a single
+# scandir pass at startup instead of one glob over the directory per paper
+_supp_index: Dict[str, str] = {}
+_SUPP_INDEX_LOCK = threading.Lock()
+
+
+def index_existing_supplementary() -> None:
+    """Index existing supplementary files by forum_id with one directory scan."""
+    with _SUPP_INDEX_LOCK:
+        _supp_index.clear()
+        for entry in os.scandir(SUPPLEMENTARY_DIR):
+            if entry.is_file():
+                name = Path(entry.name)
+                _supp_index[name.stem] = name.suffix
+    if _supp_index:
+        logger.info(f"Indexed {len(_supp_index)} existing supplementary files")
+
+
+def remember_supplementary(forum_id: str, suffix: str) -> None:
+    """Record a freshly downloaded supplementary file in the index."""
+    with _SUPP_INDEX_LOCK:
+        _supp_index[forum_id] = suffix
+
+
+@functools.lru_cache(maxsize=1024)
+def _url_key(url: str) -> Tuple[str, str, str]:
+    """Normalized (host, path, attachment-id) key for URL identity checks."""
+    parsed = urlparse(url)
+    attachment_id = parse_qs(parsed.query).get('id', [''])[0]
+    return (parsed.netloc.lower(), parsed.path, attachment_id)
+
+
+def urls_are_same_file(a: str, b: str) -> bool:
+    """True when two URLs point at the same file (host, path, and attachment id)."""
+    return bool(a) and bool(b) and _url_key(a) == _url_key(b)
 
 
 def setup_directories():
@@ -54,9 +173,64 @@ def setup_directories():
     logger.info("Directories created/verified")
 
 
-def polite_delay():
-    """Add a random delay between requests."""
-    time.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
+class TokenBucket:
+    """Token-bucket rate limiter shared across worker threads.
+
+    Refills `rate` tokens per second up to `capacity`. acquire() blocks
+    until a token is available, so bursts are allowed up to `capacity`
+    while the long-run request rate stays at `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Only OpenReview needs throttling; Stanford/GitHub requests pass through
+_RATE_LIMITERS = {
+    'openreview.net': TokenBucket(RATE_LIMIT, RATE_BURST),
+    'api2.openreview.net': TokenBucket(RATE_LIMIT, RATE_BURST),
+}
+
+# Separate pool (distinct from the per-paper pool, to avoid deadlock) used to
+# overlap each paper's PDF transfer with its review/supplementary work
+_PDF_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+def polite_delay(url: Optional[str] = None):
+    """Throttle requests to rate-limited hosts via their token bucket.
+
+    Requests to hosts without a configured limit are not delayed. With no
+    URL, the OpenReview API bucket is used (the API client's traffic).
+    """
+    host = urlparse(url).netloc if url else 'api2.openreview.net'
+    limiter = _RATE_LIMITERS.get(host)
+    if limiter:
+        limiter.acquire()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: 2^attempt seconds, capped at 30s.
+
+    Jitter spreads out retries so concurrent workers don't hammer the
+    server in lockstep after a shared transient failure.
+    """
+    return min(30.0, (2 ** attempt) * (1 + random.uniform(0, 0.5)))
 
 
 def load_metadata() -> pd.DataFrame:
@@ -69,16 +243,26 @@ def load_metadata() -> pd.DataFrame:
         return pd.DataFrame()
     
     try:
-        df = pd.read_csv(metadata_path)
+        # dtype=str + keep_default_na=False keeps every field a plain string
+        # ('' for missing) straight out of pandas' C tokenizer, so downstream
+        # code never sees NaN floats for empty link columns
+        df = pd.read_csv(metadata_path, dtype=str, keep_default_na=False)
+        # Vectorized column-wise strip instead of per-cell Python calls
+        for col in df.columns:
+            df[col] = df[col].str.strip()
         logger.info(f"Loaded {len(df)} papers from {metadata_path}")
         return df
-    except Exception as e:
+    except (OSError, ValueError) as e:
         logger.error(f"Error loading metadata from {metadata_path}: {e}", exc_info=True)
         return pd.DataFrame()
 
 
 def initialize_openreview_client():
     """Initialize OpenReview API v2 client. Try anonymous first, then authenticated."""
+    # Imported here rather than at module top: openreview-py drags in a heavy
+    # dependency tree, and resume runs that short-circuit never need it
+    import openreview
+
     # First, try anonymous access (no login required for public conferences)
     try:
         client = openreview.api.OpenReviewClient(baseurl=OPENREVIEW_API_BASE)
@@ -101,7 +285,7 @@ def initialize_openreview_client():
         # Still return a client - it might work for some operations
         try:
             return openreview.api.OpenReviewClient(baseurl=OPENREVIEW_API_BASE)
-        except:
+        except Exception:
             return None
     
     try:
@@ -117,91 +301,191 @@ def initialize_openreview_client():
         return None
 
 
-def download_pdf(client: Optional[openreview.api.OpenReviewClient], forum_id: str) -> bool:
+# Notes bulk-fetched per venue, keyed by forum id (filled by prefetch_forum_notes)
+_notes_by_forum: Dict[str, List] = {}
+
+
+def prefetch_forum_notes(client: Optional[openreview.api.OpenReviewClient], forum_ids: List[str]) -> None:
+    """Bulk-fetch notes for all forums with one venue-scoped query.
+
+    Derives the venue's submission invitation from the first forum's notes,
+    then pulls every submission (with its replies) in a single paginated
+    query instead of one get_all_notes round-trip per paper. Forums missing
+    from the bulk result simply fall back to the per-forum fetch.
+    """
+    if not client or not forum_ids:
+        return
+
+    import openreview
+
+    try:
+        polite_delay(OPENREVIEW_API_BASE)
+        sample = client.get_all_notes(forum=forum_ids[0])
+
+        # The submission note is the one whose id equals the forum id
+        invitation = None
+        for note in sample:
+            if note.id == note.forum:
+                invitations = getattr(note, 'invitations', None) or []
+                if invitations:
+                    invitation = invitations[0]
+                break
+
+        if not invitation:
+            logger.debug("Could not derive submission invitation, falling back to per-forum fetches")
+            return
+
+        logger.info(f"Bulk-fetching submissions via invitation: {invitation}")
+        polite_delay(OPENREVIEW_API_BASE)
+        submissions = client.get_all_notes(invitation=invitation, details='replies')
+
+        wanted = set(forum_ids)
+        for note in submissions:
+            if note.forum in wanted:
+                replies = (getattr(note, 'details', None) or {}).get('replies', [])
+                _notes_by_forum[note.forum] = [note] + [
+                    openreview.api.Note.from_json(reply) for reply in replies
+                ]
+        logger.info(f"Bulk fetch covered {len(_notes_by_forum)}/{len(forum_ids)} papers")
+
+    except Exception as e:
+        logger.warning(f"Bulk note prefetch failed, falling back to per-forum fetches: {e}")
+
+
+def fetch_forum_notes(client: Optional[openreview.api.OpenReviewClient], forum_id: str) -> Optional[List]:
+    """Fetch all notes for a forum once, so PDF and review downloads share one API call."""
+    cached = _notes_by_forum.get(forum_id)
+    if cached is not None:
+        return cached
+    if not client:
+        return None
+    try:
+        polite_delay(OPENREVIEW_API_BASE)
+        return client.get_all_notes(forum=forum_id, details="all")
+    except Exception as e:
+        logger.debug(f"Error fetching notes for {forum_id}: {e}")
+        return None
+
+
+def download_pdf(client: Optional[openreview.api.OpenReviewClient], forum_id: str,
+                 notes: Optional[List] = None) -> bool:
     """Download PDF for a given forum_id. Try direct download first, then API, then web scraping."""
     pdf_path = PDF_DIR / f"{forum_id}.pdf"
     
-    # Always try to download (will overwrite if exists, but check file size first)
+    # Always try to download (will overwrite if exists, but validate first)
     if pdf_path.exists():
         file_size = pdf_path.stat().st_size
-        # If file is very small (< 1KB), likely corrupted, re-download
+        # A real PDF is at least 1KB and starts with the %PDF magic; anything
+        # else (error page saved as .pdf, truncated write) gets re-downloaded
         if file_size > 1024:
-            logger.debug(f"PDF already exists: {pdf_path} ({file_size} bytes)")
-            return True
-        else:
-            logger.info(f"PDF exists but seems corrupted ({file_size} bytes), re-downloading: {pdf_path}")
+            with open(pdf_path, 'rb') as f:
+                magic = f.read(4)
+            if magic == b'%PDF':
+                logger.debug(f"PDF already exists: {pdf_path} ({file_size} bytes)")
+                return True
+        logger.info(f"PDF exists but seems corrupted ({file_size} bytes), re-downloading: {pdf_path}")
     
-    # Method 1: Direct download from OpenReview (simplest and most reliable)
-    max_retries = 3
+    # Method 1: Direct download from OpenReview (simplest and most reliable).
+    # Skipped when a previous run found the direct link serves no PDF.
+    max_retries = 3 if forum_id not in _no_direct_pdf else 0
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
-    
+
     for attempt in range(max_retries):
         try:
             direct_pdf_url = f"{OPENREVIEW_BASE}/pdf?id={forum_id}"
-            polite_delay()
-            # Use stream=True for large PDFs
-            response = requests.get(direct_pdf_url, headers=headers, timeout=120, 
-                                  allow_redirects=True, stream=True)
-            response.raise_for_status()
-            
-            # Check first chunk to verify it's a PDF
-            first_chunk = next(response.iter_content(chunk_size=4), b'')
-            if first_chunk[:4] == b'%PDF':
-                # Stream download the rest
-                with open(pdf_path, 'wb') as f:
-                    f.write(first_chunk)
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                
-                # Verify file size
-                file_size = pdf_path.stat().st_size
-                if file_size > 1024:  # At least 1KB
-                    logger.info(f"Downloaded PDF via direct link: {pdf_path} ({file_size} bytes)")
-                    return True
-                else:
-                    logger.warning(f"Downloaded PDF too small ({file_size} bytes), retrying...")
-                    if pdf_path.exists():
+            polite_delay(direct_pdf_url)
+            # Use stream=True for large PDFs. The with-block guarantees the
+            # response is closed on every exit path (non-PDF bail-out, HTTP
+            # errors); an abandoned streamed response would otherwise hold
+            # its blocking-pool connection forever
+            with SESSION.get(direct_pdf_url, headers=headers, timeout=120,
+                             allow_redirects=True, stream=True) as response:
+                response.raise_for_status()
+
+                # Check the magic bytes to verify it's a PDF
+                response.raw.decode_content = True
+                first_chunk = response.raw.read(4)
+                if first_chunk[:4] == b'%PDF':
+                    # Stream the rest in 1MiB buffers; copyfileobj does the
+                    # copy in C instead of a Python loop over 8KB chunks
+                    with open(pdf_path, 'wb', buffering=1 << 20) as f:
+                        f.write(first_chunk)
+                        shutil.copyfileobj(response.raw, f, length=1 << 20)
+                        f.flush()
+                        if hasattr(os, 'posix_fadvise'):
+                            # We won't re-read these pages; let the kernel drop them
+                            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+                    # Verify file size, and against Content-Length when the
+                    # server sent one (catches silently truncated transfers).
+                    # Content-Length counts wire bytes, so the comparison is
+                    # only valid when the body wasn't content-encoded — we
+                    # decode gzip/deflate on read and would never match
+                    file_size = pdf_path.stat().st_size
+                    expected_size = None
+                    if not response.headers.get('Content-Encoding'):
+                        expected_size = response.headers.get('Content-Length')
+                    if expected_size and expected_size.isdigit() and file_size != int(expected_size):
+                        logger.warning(f"Downloaded PDF truncated ({file_size}/{expected_size} bytes), retrying...")
                         pdf_path.unlink()
-            else:
-                logger.debug(f"Direct PDF link returned non-PDF content for {forum_id}")
-                break  # Don't retry if it's not a PDF
-                
+                    elif file_size > 1024:  # At least 1KB
+                        logger.info(f"Downloaded PDF via direct link: {pdf_path} ({file_size} bytes)")
+                        return True
+                    else:
+                        logger.warning(f"Downloaded PDF too small ({file_size} bytes), retrying...")
+                        if pdf_path.exists():
+                            pdf_path.unlink()
+                else:
+                    logger.debug(f"Direct PDF link returned non-PDF content for {forum_id}")
+                    remember_no_direct_pdf(forum_id)
+                    break  # Don't retry if it's not a PDF
+
         except (requests.exceptions.ChunkedEncodingError,
                 requests.exceptions.ConnectionError,
-                requests.exceptions.IncompleteRead) as e:
+                ProtocolError, IncompleteRead) as e:
+            # Reading response.raw directly surfaces urllib3/http.client
+            # errors unwrapped, so catch those alongside requests' own
             if attempt < max_retries - 1:
                 logger.warning(f"PDF download interrupted for {forum_id} (attempt {attempt + 1}/{max_retries}): {e}. Retrying...")
                 if pdf_path.exists():
                     pdf_path.unlink()
-                time.sleep(2)  # Wait before retry
+                time.sleep(backoff_delay(attempt))  # Wait before retry
             else:
                 logger.debug(f"Direct download method failed for {forum_id} after {max_retries} attempts: {e}. Trying API...")
-        except Exception as e:
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            # Only 429 and 5xx are worth retrying; other 4xx won't change
+            if (status == 429 or (status is not None and status >= 500)) and attempt < max_retries - 1:
+                logger.warning(f"PDF download got HTTP {status} for {forum_id} (attempt {attempt + 1}/{max_retries}). Retrying...")
+                time.sleep(backoff_delay(attempt))
+            else:
+                logger.debug(f"Direct download method failed for {forum_id} (HTTP {status}). Trying API...")
+                break  # Try next method
+        except (requests.RequestException, OSError) as e:
             logger.debug(f"Direct download method failed for {forum_id}: {e}. Trying API...")
             break  # Try next method
     
     # Method 2: Try using API to get PDF ID
-    if client:
+    if notes is None:
+        notes = fetch_forum_notes(client, forum_id)
+    if notes:
         try:
-            polite_delay()
-            notes = client.get_all_notes(forum=forum_id, details="all")
-            
             # Find submission note (usually the first one or has 'content' with 'pdf')
             pdf_id = None
             for note in notes:
-                if hasattr(note, 'content') and isinstance(note.content, dict):
-                    if 'pdf' in note.content:
-                        pdf_id = note.content['pdf']
-                        break
+                # Single getattr instead of hasattr + repeated attribute reads
+                content = getattr(note, 'content', None)
+                if isinstance(content, dict) and 'pdf' in content:
+                    pdf_id = content['pdf']
+                    break
             
             if pdf_id:
                 # Download PDF via API
                 pdf_url = f"{OPENREVIEW_API_BASE}/pdf/{pdf_id}"
-                polite_delay()
-                response = requests.get(pdf_url, timeout=60)
+                polite_delay(pdf_url)
+                response = SESSION.get(pdf_url, timeout=60)
                 response.raise_for_status()
                 
                 # Check if response is actually a PDF
@@ -210,7 +494,7 @@ def download_pdf(client: Optional[openreview.api.OpenReviewClient], forum_id: st
                         f.write(response.content)
                     logger.info(f"Downloaded PDF via API: {pdf_path}")
                     return True
-        except Exception as e:
+        except (requests.RequestException, OSError, KeyError, TypeError, AttributeError) as e:
             logger.debug(f"API method failed for {forum_id}: {e}. Trying web scraping...")
     
     # Method 3: Fallback to web scraping (for public PDFs)
@@ -219,17 +503,17 @@ def download_pdf(client: Optional[openreview.api.OpenReviewClient], forum_id: st
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        polite_delay()
-        response = requests.get(forum_url, headers=headers, timeout=30)
+        polite_delay(forum_url)
+        response = SESSION.get(forum_url, headers=headers, timeout=30)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=_PDF_LINK_STRAINER)
         
         # Find PDF download link
         pdf_link = None
         for a in soup.find_all('a', href=True):
             href = a['href']
-            text = a.get_text(strip=True).lower()
-            if 'pdf' in text or 'download' in text or '/pdf/' in href:
+            text = a.get_text(strip=True)
+            if _PDF_HINT_RE.search(text) or '/pdf/' in href:
                 if href.startswith('http'):
                     pdf_link = href
                 else:
@@ -244,8 +528,8 @@ def download_pdf(client: Optional[openreview.api.OpenReviewClient], forum_id: st
                     break
         
         if pdf_link:
-            polite_delay()
-            response = requests.get(pdf_link, headers=headers, timeout=60)
+            polite_delay(pdf_link)
+            response = SESSION.get(pdf_link, headers=headers, timeout=60)
             response.raise_for_status()
             
             if response.content[:4] == b'%PDF':
@@ -254,46 +538,59 @@ def download_pdf(client: Optional[openreview.api.OpenReviewClient], forum_id: st
                 logger.info(f"Downloaded PDF via web scraping: {pdf_path}")
                 return True
     
-    except Exception as e:
+    except (requests.RequestException, OSError) as e:
         logger.debug(f"Web scraping method failed for {forum_id}: {e}")
     
     logger.warning(f"Could not download PDF for forum_id: {forum_id}")
     return False
 
 
-def download_review_history(client: Optional[openreview.api.OpenReviewClient], forum_id: str) -> bool:
+def download_review_history(client: Optional[openreview.api.OpenReviewClient], forum_id: str,
+                            notes: Optional[List] = None) -> bool:
     """Download full review history as JSON."""
     review_path = REVIEWS_DIR / f"{forum_id}.json"
-    
-    if review_path.exists():
+
+    # An empty file means an interrupted earlier run - re-download it
+    if review_path.exists() and review_path.stat().st_size > 2:
         logger.debug(f"Review history already exists: {review_path}")
         return True
-    
-    if not client:
-        logger.warning(f"Cannot download review history for {forum_id}: client not available")
+
+    if notes is None:
+        if not client:
+            logger.warning(f"Cannot download review history for {forum_id}: client not available")
+            return False
+        notes = fetch_forum_notes(client, forum_id)
+
+    if notes is None:
+        logger.warning(f"Could not fetch notes for {forum_id}")
         return False
-    
+
     try:
-        polite_delay()
-        notes = client.get_all_notes(forum=forum_id, details="all")
-        
         # Convert all notes to JSON
         notes_json = []
         for note in notes:
             try:
                 note_json = note.to_json()
                 notes_json.append(note_json)
-            except Exception as e:
+            except (TypeError, AttributeError, ValueError) as e:
                 logger.warning(f"Error converting note to JSON for {forum_id}: {e}")
         
-        # Save as JSON
+        # Serialize once; skip the write (and the mtime bump) if unchanged
+        if orjson is not None:
+            payload = orjson.dumps(notes_json, option=orjson.OPT_INDENT_2).decode('utf-8')
+        else:
+            payload = json.dumps(notes_json, indent=2, ensure_ascii=False)
+        if review_path.exists() and review_path.read_text(encoding='utf-8') == payload:
+            logger.debug(f"Review history unchanged: {review_path}")
+            return True
+
         with open(review_path, 'w', encoding='utf-8') as f:
-            json.dump(notes_json, f, indent=2, ensure_ascii=False)
-        
+            f.write(payload)
+
         logger.info(f"Saved review history: {review_path} ({len(notes_json)} notes)")
         return True
     
-    except Exception as e:
+    except (OSError, TypeError, ValueError) as e:
         logger.error(f"Error downloading review history for {forum_id}: {e}", exc_info=True)
         return False
 
@@ -302,41 +599,44 @@ def download_supplementary(forum_id: str, supplementary_link: str = None) -> boo
     """Download supplementary materials from forum page."""
     supplementary_path = SUPPLEMENTARY_DIR / f"{forum_id}"
     
-    # Check if already exists (with any extension)
-    existing_files = list(SUPPLEMENTARY_DIR.glob(f"{forum_id}.*"))
-    if existing_files:
-        logger.debug(f"Supplementary already exists: {existing_files[0]}")
+    # Check the startup index instead of re-globbing the directory per paper
+    if forum_id in _supp_index:
+        logger.debug(f"Supplementary already exists: {forum_id}{_supp_index[forum_id]}")
         return True
     
     try:
         forum_url = f"{OPENREVIEW_BASE}/forum?id={forum_id}"
-        polite_delay()
-        response = requests.get(forum_url, timeout=30)
+        polite_delay(forum_url)
+        response = SESSION.get(forum_url, timeout=30)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=_A_HREF_STRAINER)
         
         # Find supplementary attachment links
         supp_links = []
         for a in soup.find_all('a', href=True):
             href = a['href']
-            text = a.get_text(strip=True).lower()
-            
-            # Check if it's a supplementary material link
-            if ('supp' in text or 'supplementary' in text or 
-                'supp' in href.lower() or 'supplementary' in href.lower()):
+            text = a.get_text(strip=True)
+
+            # Check if it's a supplementary material link (one case-insensitive
+            # scan per string instead of repeated lower() + substring tests)
+            if _SUPP_HINT_RE.search(text) or _SUPP_HINT_RE.search(href):
                 full_url = urljoin(OPENREVIEW_BASE, href) if not href.startswith('http') else href
                 supp_links.append((full_url, text))
+                break  # Only the first page match is ever downloaded
         
         # Also check if supplementary_link was provided in metadata
-        if supplementary_link and supplementary_link not in [url for url, _ in supp_links]:
+        if supplementary_link:
             supp_links.append((supplementary_link, 'supplementary'))
-        
-        if not supp_links:
+
+        # De-duplicate by URL in one pass while preserving page order
+        supp_urls = list(dict.fromkeys(url for url, _ in supp_links))
+
+        if not supp_urls:
             logger.debug(f"No supplementary materials found for {forum_id}")
             return False
-        
+
         # Download the first supplementary link found
-        supp_url, _ = supp_links[0]
+        supp_url = supp_urls[0]
         
         # Handle OpenReview attachment URLs
         if '/attachment' in supp_url:
@@ -363,30 +663,32 @@ def download_supplementary(forum_id: str, supplementary_link: str = None) -> boo
                 
                 for attempt in range(max_retries):
                     try:
-                        polite_delay()
-                        # Use stream=True for large files to avoid memory issues
-                        response = requests.get(attachment_url, headers=headers, timeout=120, 
-                                              allow_redirects=True, stream=True)
-                        response.raise_for_status()
-                        
-                        # Get file extension from Content-Disposition if available
-                        content_disposition = response.headers.get('Content-Disposition', '')
-                        if 'filename=' in content_disposition:
-                            filename = re.search(r'filename[^;=\n]*=(([\'"]).*?\2|[^\s;]+)', content_disposition)
-                            if filename:
-                                ext = Path(filename.group(1).strip('"\'')).suffix or 'zip'
-                                supplementary_path = SUPPLEMENTARY_DIR / f"{forum_id}{ext}"
-                        
-                        # Stream download to file
-                        total_size = 0
-                        with open(supplementary_path, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
-                                    total_size += len(chunk)
+                        polite_delay(attachment_url)
+                        # Use stream=True for large files to avoid memory
+                        # issues; the with-block closes the response on every
+                        # exit path so its pooled connection is always returned
+                        with SESSION.get(attachment_url, headers=headers, timeout=120,
+                                         allow_redirects=True, stream=True) as response:
+                            response.raise_for_status()
+
+                            # Get file extension from Content-Disposition if available
+                            content_disposition = response.headers.get('Content-Disposition', '')
+                            if 'filename=' in content_disposition:
+                                filename = _FILENAME_RE.search(content_disposition)
+                                if filename:
+                                    ext = Path(filename.group(1).strip('"\'')).suffix or 'zip'
+                                    supplementary_path = SUPPLEMENTARY_DIR / f"{forum_id}{ext}"
+
+                            # Stream download to file in 1MiB buffers; the copy
+                            # runs in C instead of a Python loop over 8KB chunks
+                            response.raw.decode_content = True
+                            with open(supplementary_path, 'wb', buffering=1 << 20) as f:
+                                shutil.copyfileobj(response.raw, f, length=1 << 20)
+                        total_size = supplementary_path.stat().st_size
                         
                         # Verify file was downloaded (at least 100 bytes)
                         if total_size > 100:
+                            remember_supplementary(forum_id, supplementary_path.suffix)
                             logger.info(f"Downloaded supplementary: {supplementary_path} ({total_size} bytes)")
                             return True
                         else:
@@ -394,18 +696,18 @@ def download_supplementary(forum_id: str, supplementary_link: str = None) -> boo
                             if supplementary_path.exists():
                                 supplementary_path.unlink()
                             
-                    except (requests.exceptions.ChunkedEncodingError, 
+                    except (requests.exceptions.ChunkedEncodingError,
                             requests.exceptions.ConnectionError,
-                            requests.exceptions.IncompleteRead) as e:
+                            ProtocolError, IncompleteRead) as e:
                         if attempt < max_retries - 1:
                             logger.warning(f"Download interrupted for {forum_id} (attempt {attempt + 1}/{max_retries}): {e}. Retrying...")
                             if supplementary_path.exists():
                                 supplementary_path.unlink()
-                            time.sleep(2)  # Wait before retry
+                            time.sleep(backoff_delay(attempt))  # Wait before retry
                         else:
                             logger.error(f"Failed to download supplementary for {forum_id} after {max_retries} attempts: {e}")
                             return False
-                    except Exception as e:
+                    except (requests.RequestException, OSError) as e:
                         logger.error(f"Error downloading supplementary for {forum_id}: {e}")
                         if supplementary_path.exists():
                             supplementary_path.unlink()
@@ -414,7 +716,7 @@ def download_supplementary(forum_id: str, supplementary_link: str = None) -> boo
         logger.debug(f"Could not download supplementary for {forum_id}")
         return False
     
-    except Exception as e:
+    except (requests.RequestException, OSError) as e:
         logger.error(f"Error downloading supplementary for {forum_id}: {e}", exc_info=True)
         return False
 
@@ -441,17 +743,20 @@ def clone_github_repo(code_link: str, forum_id: str) -> bool:
         # Handle various GitHub URL formats
         if 'github.com' in code_link:
             # Normalize to https://github.com/owner/repo format
-            match = re.search(r'github\.com[/:]([^/]+)/([^/\s]+)', code_link)
+            match = _GITHUB_REPO_RE.search(code_link)
             if match:
                 owner = match.group(1)
                 repo = match.group(2).rstrip('.git')
                 repo_url = f"https://github.com/{owner}/{repo}.git"
                 
                 logger.info(f"Cloning GitHub repo: {repo_url}")
-                polite_delay()
+                polite_delay(repo_url)
                 
+                # Shallow, single-branch, tagless clone - the dataset only
+                # needs the current tree, not the repo's history
                 result = subprocess.run(
-                    ['git', 'clone', repo_url, str(code_path)],
+                    ['git', 'clone', '--depth', '1', '--single-branch', '--no-tags',
+                     repo_url, str(code_path)],
                     capture_output=True,
                     text=True,
                     timeout=300
@@ -469,37 +774,80 @@ def clone_github_repo(code_link: str, forum_id: str) -> bool:
     except subprocess.TimeoutExpired:
         logger.error(f"Git clone timeout for {code_link}")
         return False
-    except Exception as e:
+    except OSError as e:
         logger.error(f"Error cloning GitHub repo {code_link}: {e}", exc_info=True)
         return False
 
 
-def process_paper(row: pd.Series, client: Optional[openreview.api.OpenReviewClient], stats: Dict[str, int]) -> None:
-    """Process a single paper: download PDF, reviews, supplementary, and code."""
+def paper_artifacts_present(forum_id: str, code_link: str) -> bool:
+    """True when every artifact for this paper already exists from a previous run."""
+    pdf_path = PDF_DIR / f"{forum_id}.pdf"
+    if not (pdf_path.exists() and pdf_path.stat().st_size > 1024):
+        return False
+    review_path = REVIEWS_DIR / f"{forum_id}.json"
+    if not (review_path.exists() and review_path.stat().st_size > 2):
+        return False
+    if forum_id not in _supp_index:
+        return False
+    if code_link and 'github.com' in code_link.lower() and not (CODE_DIR / forum_id).exists():
+        return False
+    return True
+
+
+def process_paper(row: Dict, client: Optional[openreview.api.OpenReviewClient]) -> Dict[str, int]:
+    """Process a single paper: download PDF, reviews, supplementary, and code.
+
+    Returns counter deltas for this paper; the caller merges them into the
+    run-wide stats on the main thread, so no locking is needed.
+    """
+    delta: Dict[str, int] = {}
+
+    def bump(key: str) -> None:
+        delta[key] = delta.get(key, 0) + 1
+
     forum_id = row.get('forum_id')
-    
+
     if not forum_id:
         logger.warning(f"Skipping paper with missing forum_id: {row.get('title', 'Unknown')}")
-        stats['skipped'] = stats.get('skipped', 0) + 1
-        return
-    
+        bump('skipped')
+        return delta
+
+    # Resume short-circuit: when everything is already on disk, don't touch
+    # the network (or the OpenReview rate budget) for this paper at all
+    raw_code_link = row.get('code_link', '')
+    raw_code_link = '' if pd.isna(raw_code_link) else str(raw_code_link)
+    if paper_artifacts_present(forum_id, raw_code_link):
+        logger.debug(f"All artifacts already present for {forum_id}, skipping")
+        bump('pdfs')
+        bump('reviews')
+        bump('supplementary')
+        if raw_code_link and 'github.com' in raw_code_link.lower():
+            bump('github_repos')
+        return delta
+
     logger.info(f"Processing paper: {forum_id} - {row.get('title', 'Unknown')[:50]}...")
-    
-    # Download PDF (works with or without client - has fallback to web scraping)
-    if download_pdf(client, forum_id):
-        stats['pdfs'] = stats.get('pdfs', 0) + 1
-    else:
-        stats['pdf_failures'] = stats.get('pdf_failures', 0) + 1
-    
+
+    # Fetch forum notes once; PDF and review downloads both consume them.
+    # Skip the fetch when the review history is already on disk - download_pdf
+    # lazily fetches on its own if its direct-download method fails.
+    notes = None
+    if client and not (REVIEWS_DIR / f"{forum_id}.json").exists():
+        notes = fetch_forum_notes(client, forum_id)
+
+    # Start the PDF download in the background (works with or without client -
+    # has fallback to web scraping); the review, supplementary, and code steps
+    # below run while the multi-MB transfer is in flight
+    pdf_future = _PDF_EXECUTOR.submit(download_pdf, client, forum_id, notes)
+
     # Download review history (requires client, but can be anonymous)
     if client:
-        if download_review_history(client, forum_id):
-            stats['reviews'] = stats.get('reviews', 0) + 1
+        if download_review_history(client, forum_id, notes=notes):
+            bump('reviews')
         else:
-            stats['review_failures'] = stats.get('review_failures', 0) + 1
+            bump('review_failures')
     else:
         logger.warning(f"OpenReview client not available, skipping review history for {forum_id}")
-        stats['review_failures'] = stats.get('review_failures', 0) + 1
+        bump('review_failures')
     
     # Download supplementary materials
     supplementary_link = row.get('supplementary_link', '')
@@ -510,9 +858,9 @@ def process_paper(row: pd.Series, client: Optional[openreview.api.OpenReviewClie
         supplementary_link = str(supplementary_link)
     
     if download_supplementary(forum_id, supplementary_link):
-        stats['supplementary'] = stats.get('supplementary', 0) + 1
+        bump('supplementary')
     else:
-        stats['supplementary_failures'] = stats.get('supplementary_failures', 0) + 1
+        bump('supplementary_failures')
     
     # Clone GitHub repo if applicable
     code_link = row.get('code_link', '')
@@ -523,18 +871,26 @@ def process_paper(row: pd.Series, client: Optional[openreview.api.OpenReviewClie
         code_link = str(code_link)
     
     if code_link and 'github.com' in code_link.lower():
-        # Check if code_link is the same as supplementary (don't download twice)
-        if supplementary_link and code_link in supplementary_link:
+        # Check if code_link is the same file as supplementary (don't download twice)
+        if urls_are_same_file(code_link, supplementary_link):
             logger.debug(f"Code link is same as supplementary, skipping: {forum_id}")
         else:
             if clone_github_repo(code_link, forum_id):
-                stats['github_repos'] = stats.get('github_repos', 0) + 1
+                bump('github_repos')
             else:
-                stats['github_failures'] = stats.get('github_failures', 0) + 1
+                bump('github_failures')
     elif code_link and '/attachment' in code_link:
         # OpenReview ZIP attachment - already handled by supplementary
         logger.debug(f"Code link is OpenReview attachment, handled by supplementary: {forum_id}")
 
+    # Collect the PDF result last so its transfer overlapped the work above
+    if pdf_future.result():
+        bump('pdfs')
+    else:
+        bump('pdf_failures')
+
+    return delta
+
 
 def main():
     """Main function to build the dataset."""
@@ -544,7 +900,11 @@ def main():
     
     # Setup directories
     setup_directories()
-    
+
+    # Load persisted discovery results from previous runs
+    load_no_direct_pdf_cache()
+    index_existing_supplementary()
+
     # Load metadata from CSV
     df = load_metadata()
     
@@ -565,7 +925,11 @@ def main():
     
     # Initialize OpenReview client
     client = initialize_openreview_client()
-    
+
+    # One venue-scoped query up front beats one API round-trip per paper
+    if 'forum_id' in df.columns:
+        prefetch_forum_notes(client, [fid for fid in df['forum_id'].tolist() if fid])
+
     # Process each paper
     stats = {
         'total': len(df),
@@ -580,13 +944,23 @@ def main():
         'github_failures': 0
     }
     
-    logger.info(f"Processing {len(df)} papers...")
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing papers"):
-        try:
-            process_paper(row, client, stats)
-        except Exception as e:
-            logger.error(f"Error processing paper {row.get('forum_id', 'unknown')}: {e}", exc_info=True)
-            stats['skipped'] = stats.get('skipped', 0) + 1
+    logger.info(f"Processing {len(df)} papers with {MAX_WORKERS} workers...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # to_dict('records') converts the frame once; iterrows would build
+        # a new Series per row on every access
+        futures = {
+            executor.submit(process_paper, row, client): row
+            for row in df.to_dict('records')
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing papers"):
+            row = futures[future]
+            try:
+                # Merge this paper's counter deltas on the main thread
+                for key, value in future.result().items():
+                    stats[key] = stats.get(key, 0) + value
+            except Exception as e:
+                logger.error(f"Error processing paper {row.get('forum_id', 'unknown')}: {e}", exc_info=True)
+                stats['skipped'] = stats.get('skipped', 0) + 1
     
     # Print summary
     logger.info("=" * 60)
@@ -5,16 +5,31 @@ Scrapes submission metadata from the submissions table and saves to CSV.
 """
 
 import re
-import time
-import random
+import json
+import shutil
 import logging
 from pathlib import Path
-from urllib.parse import urljoin
 from typing import Optional
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Constants
+SUBMISSIONS_URL = "https://agents4science.stanford.edu/submissions.html"
+OPENREVIEW_BASE = "https://openreview.net"
+DOWNLOAD_DIR = Path("downloads")
+METADATA_CSV = DOWNLOAD_DIR / "metadata.csv"
+METADATA_PARQUET = DOWNLOAD_DIR / "metadata.parquet"
+# On-disk copy of the upstream CSV plus its validators, so unchanged runs
+# revalidate with a conditional request instead of re-downloading the body
+PAPERS_CSV_CACHE = DOWNLOAD_DIR / "papers.csv"
+PAPERS_CSV_META = DOWNLOAD_DIR / ".papers_csv.meta"
+
+# The log file lives under downloads/, so that directory must exist before
+# the FileHandler below opens it
+DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 # Configure logging
 logging.basicConfig(
@@ -27,15 +42,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Constants
-SUBMISSIONS_URL = "https://agents4science.stanford.edu/submissions.html"
-OPENREVIEW_BASE = "https://openreview.net"
-DOWNLOAD_DIR = Path("downloads")
-METADATA_CSV = DOWNLOAD_DIR / "metadata.csv"
+# Shared session: keep-alive + pooled connections avoid a fresh TCP/TLS
+# handshake per request, and transient errors are retried with backoff
+SESSION = requests.Session()
+SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+})
+_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504)),
+)
+SESSION.mount('https://', _ADAPTER)
+SESSION.mount('http://', _ADAPTER)
 
-# Request delays (in seconds)
-MIN_DELAY = 0.3
-MAX_DELAY = 1.0
+# Compiled once at import; re.search on a string pattern pays a cache
+# lookup plus an extra call layer on every invocation
+_FORUM_ID_RE = re.compile(r'forum\?id=([^&\s]+)')
+_ID_PATH_RE = re.compile(r'/([a-zA-Z0-9_-]{20,})')
 
 
 def setup_directories():
@@ -44,91 +68,139 @@ def setup_directories():
     logger.info("Directories created/verified")
 
 
-def polite_delay():
-    """Add a random delay between requests."""
-    time.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
-
-
 def extract_forum_id(openreview_link: str) -> Optional[str]:
     """Extract forum_id from OpenReview link."""
     if not openreview_link:
         return None
     # Match patterns like: https://openreview.net/forum?id=XXXXX
-    match = re.search(r'forum\?id=([^&\s]+)', openreview_link)
+    match = _FORUM_ID_RE.search(openreview_link)
     if match:
         return match.group(1)
     # Also try direct ID patterns
-    match = re.search(r'/([a-zA-Z0-9_-]{20,})', openreview_link)
+    match = _ID_PATH_RE.search(openreview_link)
     if match:
         return match.group(1)
     return None
 
 
+def parse_csv_line(line):
+    """Parse one CSV line into field values (handles quoted fields)."""
+    values = []
+    # Accumulate characters in a list and join once per field; repeated
+    # str += copies the whole prefix on every character
+    buf = []
+    in_quotes = False
+    append_char = buf.append
+    for char in line:
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ',' and not in_quotes:
+            values.append(''.join(buf).strip())
+            buf.clear()
+        else:
+            append_char(char)
+    values.append(''.join(buf).strip())
+    return values
+
+
+def parse_csv_fallback(csv_text: str) -> pd.DataFrame:
+    """Pure-Python CSV parse, used only when the pandas C tokenizer fails."""
+    lines = csv_text.strip().split('\n')
+    if len(lines) < 2:
+        return pd.DataFrame()
+
+    # Parse header
+    headers = [h.strip().strip('"') for h in parse_csv_line(lines[0])]
+    # printf-style args defer formatting until a handler actually emits
+    logger.debug("CSV headers: %s", headers)
+
+    # Column-major construction: pandas stores columns contiguously, so
+    # filling per-column lists directly skips one dict allocation per row
+    # and the column-wise reassembly pd.DataFrame(rows) does internally
+    cols = {header: [] for header in headers}
+    appenders = [col.append for col in cols.values()]
+
+    # Bind loop invariants to locals once; global/attribute lookups
+    # inside the row loop add up across thousands of cells
+    parse_line = parse_csv_line
+    n_headers = len(headers)
+
+    # Parse data rows
+    for i, line in enumerate(lines[1:], 1):
+        if not line.strip():
+            continue
+        # Quote-free lines (the common case) split in one C call; only
+        # quoted lines need the per-character state machine
+        if '"' not in line:
+            values = [v.strip() for v in line.split(',')]
+        else:
+            values = parse_line(line)
+        if len(values) < n_headers:
+            logger.warning("Row %s has fewer values than headers, skipping", i)
+            continue
+
+        # zip is bounded by appenders, so extra trailing values are ignored
+        for append, value in zip(appenders, values):
+            append(value.strip().strip('"'))
+
+    return pd.DataFrame(cols, copy=False)
+
+
 def parse_submissions_table() -> pd.DataFrame:
     """Parse submissions table from the CSV data file (loaded by JavaScript)."""
     # The table is dynamically loaded from data/papers.csv via JavaScript
     # So we need to fetch the CSV directly instead of parsing HTML
     csv_url = "https://agents4science.stanford.edu/data/papers.csv"
     logger.info(f"Fetching data from {csv_url}")
-    polite_delay()
-    
+
+    # Send the cached validators so an unchanged upstream file answers
+    # with a bodyless 304 instead of the full CSV
+    conditional_headers = {}
+    if PAPERS_CSV_CACHE.exists() and PAPERS_CSV_META.exists():
+        try:
+            meta = json.loads(PAPERS_CSV_META.read_text(encoding='utf-8'))
+            if meta.get('etag'):
+                conditional_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                conditional_headers['If-Modified-Since'] = meta['last_modified']
+        except (OSError, ValueError):
+            pass
+
     try:
-        # Add User-Agent header to avoid being blocked
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        response = requests.get(csv_url, headers=headers, timeout=30)
-        response.raise_for_status()
-        logger.debug(f"Response status: {response.status_code}, Content length: {len(response.content)}")
-        
-        # Parse CSV directly
-        csv_text = response.text
-        lines = csv_text.strip().split('\n')
-        if len(lines) < 2:
+        # The session already carries a browser User-Agent to avoid being
+        # blocked. stream=True spools the body straight to the disk cache
+        # without ever holding it whole in memory
+        with SESSION.get(csv_url, headers=conditional_headers, stream=True, timeout=30) as response:
+            if response.status_code == 304:
+                logger.info("Upstream CSV unchanged (HTTP 304), parsing cached copy")
+            else:
+                response.raise_for_status()
+                logger.debug("Response status: %s, Content length: %s",
+                             response.status_code,
+                             response.headers.get('content-length', 'unknown'))
+                response.raw.decode_content = True
+                with open(PAPERS_CSV_CACHE, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1 << 20)
+                PAPERS_CSV_META.write_text(json.dumps({
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }), encoding='utf-8')
+
+        try:
+            # quotechar/skipinitialspace let the C tokenizer handle
+            # quoting and stray whitespace with no per-cell Python work
+            df = pd.read_csv(PAPERS_CSV_CACHE, dtype=str, keep_default_na=False,
+                             quotechar='"', skipinitialspace=True)
+        except pd.errors.EmptyDataError:
+            logger.error("CSV file is empty or has no data rows")
+            return pd.DataFrame()
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            logger.warning(f"pandas CSV parse failed ({e}), falling back to line parser")
+            df = parse_csv_fallback(PAPERS_CSV_CACHE.read_text(encoding='utf-8'))
+
+        if df.empty:
             logger.error("CSV file is empty or has no data rows")
             return pd.DataFrame()
-        
-        # Parse CSV manually (handling quoted fields)
-        rows = []
-        headers_line = lines[0]
-        
-        # Simple CSV parser (handles quoted fields)
-        def parse_csv_line(line):
-            values = []
-            current = ''
-            in_quotes = False
-            for char in line:
-                if char == '"':
-                    in_quotes = not in_quotes
-                elif char == ',' and not in_quotes:
-                    values.append(current.strip())
-                    current = ''
-                else:
-                    current += char
-            values.append(current.strip())
-            return values
-        
-        # Parse header
-        headers = [h.strip().strip('"') for h in parse_csv_line(headers_line)]
-        logger.debug(f"CSV headers: {headers}")
-        
-        # Parse data rows
-        for i, line in enumerate(lines[1:], 1):
-            if not line.strip():
-                continue
-            values = parse_csv_line(line)
-            if len(values) < len(headers):
-                logger.warning(f"Row {i} has fewer values than headers, skipping")
-                continue
-            
-            row_data = {}
-            for j, header in enumerate(headers):
-                value = values[j].strip().strip('"') if j < len(values) else ''
-                row_data[header] = value
-            
-            rows.append(row_data)
-        
-        df = pd.DataFrame(rows)
         logger.info(f"Parsed {len(df)} submissions from CSV")
         
         # Map CSV columns to our expected format
@@ -137,7 +209,10 @@ def parse_submissions_table() -> pd.DataFrame:
         #              primary_topic, secondary_topic
         if 'link' in df.columns:
             df['openreview_link'] = df['link']
-            df['forum_id'] = df['link'].apply(extract_forum_id)
+            # Two vectorized regex sweeps instead of a Python call per row;
+            # the path-ID pattern only fills rows the forum?id= pattern missed
+            fid = df['link'].str.extract(_FORUM_ID_RE, expand=False)
+            df['forum_id'] = fid.fillna(df['link'].str.extract(_ID_PATH_RE, expand=False))
         
         # Rename columns to match expected format
         column_mapping = {
@@ -148,7 +223,14 @@ def parse_submissions_table() -> pd.DataFrame:
             'hypothesis_development': 'hypothesis_development_label'
         }
         df = df.rename(columns=column_mapping)
-        
+
+        # Bulk numeric conversion: one C pass per score column with NaN
+        # for blanks/garbage, instead of a per-cell float() try/except
+        for col in ['human_review_score', 'ai_reviewer_1_score',
+                    'ai_reviewer_2_score', 'ai_reviewer_3_score']:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+
         # Add missing columns with default values
         if 'authors' not in df.columns:
             df['authors'] = ''
@@ -159,7 +241,9 @@ def parse_submissions_table() -> pd.DataFrame:
         
         # Filter out rows without valid forum_id
         initial_count = len(df)
-        df = df[df['forum_id'].notna() & (df['forum_id'] != '')]
+        # str.extract leaves NaN wherever neither pattern matched, so a
+        # single dropna pass replaces the notna + != '' double scan
+        df = df.dropna(subset=['forum_id'])
         if len(df) < initial_count:
             logger.warning(f"Filtered out {initial_count - len(df)} rows without valid forum_id")
         
@@ -168,127 +252,6 @@ def parse_submissions_table() -> pd.DataFrame:
     except Exception as e:
         logger.error(f"Error fetching/parsing CSV data: {e}", exc_info=True)
         return pd.DataFrame()
-        
-        # Extract rows from tbody (skip thead rows)
-        rows = []
-        tbody = table.find('tbody')
-        
-        # Debug: log table structure
-        thead = table.find('thead')
-        logger.debug(f"Table structure - has thead: {thead is not None}, has tbody: {tbody is not None}")
-        
-        if not tbody:
-            # If no tbody, get all rows and skip header rows in thead
-            all_rows = table.find_all('tr')
-            thead_rows = table.find('thead')
-            skip_count = len(thead_rows.find_all('tr')) if thead_rows else 1
-            data_rows = all_rows[skip_count:]
-            logger.debug(f"No tbody found, using all rows (skip {skip_count} header rows)")
-        else:
-            # Get all rows from tbody (no need to skip, thead is separate)
-            data_rows = tbody.find_all('tr')
-            logger.debug(f"Found tbody with {len(data_rows)} rows")
-        
-        logger.info(f"Found {len(data_rows)} data rows to process")
-        
-        # Debug: check first row if exists
-        if data_rows:
-            first_row_cells = data_rows[0].find_all('td')
-            logger.debug(f"First data row has {len(first_row_cells)} cells")
-            if first_row_cells:
-                logger.debug(f"First cell text: {first_row_cells[0].get_text(strip=True)[:50]}")
-        
-        for tr in data_rows:
-            cells = tr.find_all('td')  # Only get td, not th (th is for headers)
-            if not cells or len(cells) < 4:
-                continue
-            
-            row_data = {}
-            cell_texts = [cell.get_text(strip=True) for cell in cells]
-            
-            # Extract links from all cells
-            links = {}
-            for cell in cells:
-                for a in cell.find_all('a', href=True):
-                    href = a['href']
-                    text = a.get_text(strip=True).lower()
-                    if 'openreview.net' in href.lower() or 'openreview' in href.lower():
-                        links['openreview'] = href if href.startswith('http') else urljoin(OPENREVIEW_BASE, href)
-                    if 'github.com' in href.lower():
-                        links['code'] = href
-                    if 'supp' in text or 'supplementary' in text or 'supp' in href.lower():
-                        links['supplementary'] = href if href.startswith('http') else urljoin(OPENREVIEW_BASE, href)
-            
-            # Map columns based on actual table structure:
-            # 0: Title (with OpenReview link)
-            # 1: Status
-            # 2: Primary Topic
-            # 3: Secondary Topic
-            # 4: Human Review Score
-            # 5: AI Reviewer 1 Score
-            # 6: AI Reviewer 2 Score
-            # 7: AI Reviewer 3 Score
-            # 8: Hypothesis Development
-            # 9: Experimental Design
-            # 10: Data Analysis
-            # 11: Writing
-            # 12: Overall
-            # 13: Code Audit Result
-            
-            row_data['title'] = cell_texts[0] if len(cell_texts) > 0 else ''
-            row_data['status'] = cell_texts[1] if len(cell_texts) > 1 else ''
-            row_data['primary_topic'] = cell_texts[2] if len(cell_texts) > 2 else ''
-            row_data['secondary_topic'] = cell_texts[3] if len(cell_texts) > 3 else ''
-            
-            # Extract forum_id from openreview link (usually in title cell)
-            openreview_link = links.get('openreview', '')
-            row_data['forum_id'] = extract_forum_id(openreview_link)
-            row_data['openreview_link'] = openreview_link
-            
-            # Extract scores (columns 4-7)
-            try:
-                row_data['human_review_score'] = float(cell_texts[4]) if len(cell_texts) > 4 and cell_texts[4] else None
-            except (ValueError, TypeError):
-                row_data['human_review_score'] = None
-            
-            try:
-                row_data['ai_reviewer_1_score'] = float(cell_texts[5]) if len(cell_texts) > 5 and cell_texts[5] else None
-            except (ValueError, TypeError):
-                row_data['ai_reviewer_1_score'] = None
-            
-            try:
-                row_data['ai_reviewer_2_score'] = float(cell_texts[6]) if len(cell_texts) > 6 and cell_texts[6] else None
-            except (ValueError, TypeError):
-                row_data['ai_reviewer_2_score'] = None
-            
-            try:
-                row_data['ai_reviewer_3_score'] = float(cell_texts[7]) if len(cell_texts) > 7 and cell_texts[7] else None
-            except (ValueError, TypeError):
-                row_data['ai_reviewer_3_score'] = None
-            
-            # Extract hypothesis development label (column 8)
-            row_data['hypothesis_development_label'] = cell_texts[8] if len(cell_texts) > 8 else ''
-            
-            # Authors - not in table, will be empty or could be extracted from title/OpenReview
-            row_data['authors'] = ''
-            
-            # Links
-            row_data['supplementary_link'] = links.get('supplementary', '')
-            row_data['code_link'] = links.get('code', '')
-            
-            # Only add row if we have a forum_id (valid OpenReview link)
-            if row_data['forum_id']:
-                rows.append(row_data)
-            else:
-                logger.warning(f"Skipping row without valid forum_id: {row_data.get('title', 'Unknown')[:50]}")
-        
-        df = pd.DataFrame(rows)
-        logger.info(f"Parsed {len(df)} submissions from table")
-        return df
-    
-    except Exception as e:
-        logger.error(f"Error parsing submissions table: {e}", exc_info=True)
-        return pd.DataFrame()
 
 
 def main():
@@ -306,11 +269,35 @@ def main():
     if df.empty:
         logger.error("No submissions found. Exiting.")
         return
-    
-    # Save metadata
-    df.to_csv(METADATA_CSV, index=False, encoding='utf-8')
-    logger.info(f"Saved metadata to {METADATA_CSV} ({len(df)} papers)")
-    
+
+    # Low-cardinality label columns: dictionary-encoding them shrinks the
+    # frame and makes the status comparisons below operate on a handful of
+    # unique values instead of one string per row
+    for col in ['status', 'primary_topic', 'secondary_topic', 'hypothesis_development_label']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    # Save metadata (skip the rewrite when nothing changed since last run,
+    # so mtime-based consumers don't see a spurious update)
+    # Serialize once with a fixed line terminator so the output is
+    # byte-identical across platforms (keeps the unchanged-check reliable)
+    csv_text = df.to_csv(index=False, lineterminator='\n')
+    if METADATA_CSV.exists() and METADATA_CSV.read_text(encoding='utf-8') == csv_text:
+        logger.info(f"Metadata unchanged, not rewriting {METADATA_CSV}")
+    else:
+        METADATA_CSV.write_text(csv_text, encoding='utf-8')
+        logger.info(f"Saved metadata to {METADATA_CSV} ({len(df)} papers)")
+
+    # Columnar companion output: Parquet keeps dtypes (including the
+    # categories above) and re-reads without the CSV tokenizer. Written
+    # only when a parquet engine (pyarrow) is installed
+    try:
+        df.to_parquet(METADATA_PARQUET, index=False)
+        logger.info(f"Saved metadata to {METADATA_PARQUET}")
+    except ImportError:
+        logger.debug("No parquet engine installed, skipping parquet output")
+
+
     # Log missing fields
     missing_fields = []
     for col in ['forum_id', 'title', 'status']:
@@ -321,13 +308,20 @@ def main():
     if missing_fields:
         logger.warning(f"Missing fields: {', '.join(missing_fields)}")
     
+    # One value_counts pass yields both numbers instead of two separate
+    # lowercase-compare-and-filter scans over the status column
+    if 'status' in df.columns:
+        status_counts = df['status'].astype(str).str.lower().value_counts()
+    else:
+        status_counts = pd.Series(dtype=int)
+
     # Print summary
     logger.info("=" * 60)
     logger.info("Metadata Scraping Summary")
     logger.info("=" * 60)
     logger.info(f"Total papers found: {len(df)}")
-    logger.info(f"Accepted: {len(df[df['status'].str.lower() == 'accepted']) if 'status' in df.columns else 0}")
-    logger.info(f"Rejected: {len(df[df['status'].str.lower() == 'rejected']) if 'status' in df.columns else 0}")
+    logger.info(f"Accepted: {status_counts.get('accepted', 0)}")
+    logger.info(f"Rejected: {status_counts.get('rejected', 0)}")
     logger.info(f"Metadata saved to: {METADATA_CSV}")
     logger.info("=" * 60)
     logger.info("Metadata scraping complete!")